@@ -19,17 +19,106 @@ Simple class wrappers for the various external commands needed by
 git-buildpackage and friends
 """
 
+import fcntl
 import subprocess
 import os
 import os.path
 import signal
+import sys
+import six
 import gbp.log as log
 
+# Linux specific, not exported by Python's fcntl module before 3.10
+F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+
 class CommandExecFailed(Exception):
     """Exception raised by the Command class"""
     pass
 
 
+def _default_sigpipe():
+    "Restore default signal handler (http://bugs.python.org/issue1652)"
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+# Python 3 restores SIGPIPE in the child itself (restore_signals) and a
+# preexec_fn keeps subprocess from using vfork()/posix_spawn()
+_preexec_fn = _default_sigpipe if six.PY2 else None
+
+
+def set_pipe_size(pipe, size=1024 * 1024):
+    """
+    Grow the kernel buffer of I{pipe} so the processes on both ends
+    need fewer context switches to pass data along. This is Linux only
+    and failures (e.g. exceeding /proc/sys/fs/pipe-max-size) are ignored.
+
+    @param pipe: the pipe to resize
+    @type pipe: C{file}
+    @param size: the new buffer size in bytes
+    @type size: C{int}
+    """
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, size)
+    except (IOError, OSError):
+        pass
+
+
+def pipe_commands(cmds, stdin=None, stdout=None):
+    """
+    Run a pipeline of commands without involving a shell
+
+    The standard output of each command is connected to the standard
+    input of the next one.
+
+    @param cmds: the commands to run
+    @type cmds: C{list} of C{list} of C{strings}
+    @param stdin: where the first command reads its input from
+    @type stdin: C{file}
+    @param stdout: where the last command writes its output to
+    @type stdout: C{file}
+    @returns: the exit status of the rightmost command that failed or 0
+    @rtype: C{int}
+
+    >>> pipe_commands([["echo", "foo"], ["grep", "-q", "foo"]])
+    0
+    >>> pipe_commands([["false"], ["cat"]])
+    1
+    >>> try:
+    ...     pipe_commands([["/bin/true"], ["/foo/bar"]])
+    ... except OSError as err:
+    ...     print(err.errno)
+    2
+    """
+    log.debug(" | ".join([" ".join(cmd) for cmd in cmds]))
+    procs = []
+    try:
+        for (i, cmd) in enumerate(cmds):
+            last = (i == len(cmds) - 1)
+            popen = subprocess.Popen(cmd,
+                                     stdin=procs[-1].stdout if procs else stdin,
+                                     stdout=stdout if last else subprocess.PIPE,
+                                     preexec_fn=_preexec_fn)
+            if procs:
+                # only the next command in the pipeline reads from it
+                procs[-1].stdout.close()
+            if not last:
+                set_pipe_size(popen.stdout)
+            procs.append(popen)
+    except OSError:
+        if procs:
+            procs[-1].stdout.close()
+        for popen in procs:
+            popen.wait()
+        raise
+
+    ret = 0
+    for popen in reversed(procs):
+        if popen.wait() and not ret:
+            ret = popen.returncode
+    return ret
+
+
 class Command(object):
     """
     Wraps a shell command, so we don't have to store any kind of command
@@ -61,10 +150,6 @@ class Command(object):
         Wraps subprocess.call so we can be verbose and fix Python's
         SIGPIPE handling
         """
-        def default_sigpipe():
-            "Restore default signal handler (http://bugs.python.org/issue1652)"
-            signal.signal(signal.SIGPIPE, signal.SIG_DFL)
-
         log.debug("%s %s %s" % (self.cmd, self.args, args))
         self._reset_state()
         stdout_arg = subprocess.PIPE if self.capture_stdout else None
@@ -79,7 +164,7 @@ class Command(object):
                                      cwd=self.cwd,
                                      shell=self.shell,
                                      env=self.env,
-                                     preexec_fn=default_sigpipe,
+                                     preexec_fn=_preexec_fn,
                                      stdout=stdout_arg,
                                      stderr=stderr_arg)
             (self.stdout, self.stderr) = popen.communicate()
@@ -196,14 +281,8 @@ class Command(object):
 class RunAtCommand(Command):
     """Run a command in a specific directory"""
     def __call__(self, dir='.', *args):
-        curdir = os.path.abspath(os.path.curdir)
-        try:
-            os.chdir(dir)
-            Command.__call__(self, list(*args))
-            os.chdir(curdir)
-        except Exception:
-            os.chdir(curdir)
-            raise
+        self.cwd = dir
+        Command.__call__(self, list(*args))
 
 
 class UnpackTarArchive(Command):
@@ -132,6 +132,8 @@ class GbpOptionParser(OptionParser):
                  'ignore-regex'    : '',
                  'compression'     : 'auto',
                  'compression-level': '9',
+                 'parallel-compression': 'True',
+                 'archive-cache': 'True',
                  'remote-url-pattern' : 'ssh://git.debian.org/git/collab-maint/%(pkg)s.git',
                  'multimaint'      : 'True',
                  'multimaint-merge': 'False',
@@ -155,6 +157,7 @@ class GbpOptionParser(OptionParser):
                  'author-date-is-committer-date': 'False',
                  'create-missing-branches': 'False',
                  'submodules'      : 'False',
+                 'submodule-jobs'  : 0,
                  'time-machine'    : 1,
                  'pbuilder-autoconf' : 'True',
                  'pbuilder-options': '',
@@ -289,6 +292,17 @@ class GbpOptionParser(OptionParser):
              'submodules':
                   ("Transparently handle submodules in the upstream tree, "
                    "default is '%(submodules)s'"),
+             'parallel-compression':
+                  ("Use a parallel compressor like pigz if installed, "
+                   "default is '%(parallel-compression)s'"),
+             'archive-cache':
+                  ("Keep the last five generated upstream tarballs in the "
+                   "git directory and reuse them when building the same "
+                   "tree again, default is '%(archive-cache)s'"),
+             'submodule-jobs':
+                  ("Number of submodules to archive in parallel when creating "
+                   "tarballs or exporting the source tree, 0 means "
+                   "one per CPU (at most 8), default is '%(submodule-jobs)s'"),
              'postimport':
                   ("hook run after a successful import, "
                    "default is '%(postimport)s'"),
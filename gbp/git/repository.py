@@ -1256,6 +1256,30 @@ class GitRepository(object):
 
 #{ Files
 
+    @staticmethod
+    def _split_paths(paths, max_len=128 * 1024):
+        """
+        Split I{paths} into chunks that can each be passed to a single git
+        invocation without hitting the system's command line length limit.
+        Always returns at least one (possibly empty) chunk.
+
+        >>> GitRepository._split_paths(['a', 'bb', 'c'])
+        [['a', 'bb', 'c']]
+        >>> GitRepository._split_paths(['a', 'bb', 'c'], 5)
+        [['a', 'bb'], ['c']]
+        >>> GitRepository._split_paths([])
+        [[]]
+        """
+        chunks = [[]]
+        length = 0
+        for path in paths:
+            if chunks[-1] and length + len(path) + 1 > max_len:
+                chunks.append([])
+                length = 0
+            chunks[-1].append(path)
+            length += len(path) + 1
+        return chunks
+
     def add_files(self, paths, force=False, index_file=None, work_tree=None):
         """
         Add files to a the repository
@@ -1280,7 +1304,8 @@ class GitRepository(object):
         if work_tree:
             extra_env['GIT_WORK_TREE'] = work_tree
 
-        self._git_command("add", args + paths, extra_env)
+        for chunk in self._split_paths(paths):
+            self._git_command("add", args + chunk, extra_env)
 
     def remove_files(self, paths, verbose=False):
         """
@@ -1295,7 +1320,8 @@ class GitRepository(object):
             paths = [ paths ]
 
         args =  [] if verbose else ['--quiet']
-        self._git_command("rm", args + paths)
+        for chunk in self._split_paths(paths):
+            self._git_command("rm", args + chunk)
 
     def list_files(self, types=['cached']):
         """
@@ -1757,6 +1783,31 @@ class GitRepository(object):
         args = [ '--auto' ] if auto else []
         self._git_command("gc", args)
 
+    def count_objects(self, object_dir=None):
+        """
+        Count the repository's objects and the disk space they use
+
+        @param object_dir: count the objects in this object directory
+            instead, e.g. an alternate object store
+        @type object_dir: C{str}
+        @return: the numeric fields reported by git-count-objects -v, sizes
+            are in KiB
+        @rtype: C{dict} of C{str} to C{int}
+        """
+        extra_env = {'GIT_OBJECT_DIRECTORY': object_dir} if object_dir else None
+        out, ret = self._git_getoutput('count-objects', ['-v'], extra_env=extra_env)
+        if ret:
+            raise GitRepositoryError("Unable to count objects")
+        counts = {}
+        for line in out:
+            key, value = line.split(':', 1)
+            try:
+                counts[key.strip()] = int(value)
+            except ValueError:
+                # e.g. the paths of alternate object stores
+                pass
+        return counts
+
 #{ Submodules
 
     def has_submodules(self, treeish=None):
@@ -32,6 +32,11 @@ compressor_opts = { 'gzip'  : [ '-n', 'gz' ],
                     'lzma'  : [ '', 'lzma' ],
                     'xz'    : [ '', 'xz' ] }
 
+# parallel implementations of the compressors taking the same options
+parallel_compressors = { 'gzip'  : 'pigz',
+                         'bzip2' : 'pbzip2',
+                         'xz'    : 'pxz' }
+
 # Map frequently used names of compression types to the internal ones:
 compressor_aliases = { 'bz2' : 'bzip2',
                        'gz'  : 'gzip', }
@@ -38,12 +38,14 @@ from gbp.errors import GbpError
 import gbp.log
 import gbp.notifications
 from gbp.scripts.common.buildpackage import (index_name, wc_name,
+                                             ArchiveCache, compressor,
                                              git_archive_submodules,
                                              git_archive_single, dump_tree,
                                              write_wc, drop_index)
 from gbp.pkg import compressor_opts, compressor_aliases, parse_archive_filename
 
-def git_archive(repo, cp, output_dir, treeish, comp_type, comp_level, with_submodules):
+def git_archive(repo, cp, output_dir, treeish, comp_type, comp_level, with_submodules,
+                submodule_jobs=0, parallel_compression=False, archive_cache=True):
     "create a compressed orig tarball in output_dir using git_archive"
     try:
         comp_opts = compressor_opts[comp_type][0]
@@ -53,26 +55,38 @@ def git_archive(repo, cp, output_dir, treeish, comp_type, comp_level, with_submo
     output = os.path.join(output_dir, du.orig_file(cp, comp_type))
     prefix = "%s-%s" % (cp['Source'], cp['Upstream-Version'])
 
+    cache = ArchiveCache(repo)
+    cache_key = None
+    if archive_cache:
+        cache_key = cache.key(treeish, prefix, with_submodules, comp_level, comp_opts,
+                              compressor(comp_type, parallel_compression))
+    if cache.fetch(cache_key, output):
+        gbp.log.debug("Using cached archive of '%s' for %s" % (treeish, output))
+        return True
+
     try:
         if repo.has_submodules() and with_submodules:
             repo.update_submodules()
             git_archive_submodules(repo, treeish, output, prefix,
-                                   comp_type, comp_level, comp_opts)
+                                   comp_type, comp_level, comp_opts,
+                                   submodule_jobs, parallel_compression)
 
         else:
             git_archive_single(treeish, output, prefix,
-                               comp_type, comp_level, comp_opts)
+                               comp_type, comp_level, comp_opts,
+                               parallel_compression)
     except (GitRepositoryError, CommandExecFailed):
         gbp.log.err("Error generating submodules' archives")
         return False
     except OSError as err:
-        gbp.log.err("Error creating %s: %s" % (output, err[0]))
+        gbp.log.err("Error creating %s: %s" % (output, err.args[0]))
         return False
     except GbpError:
         raise
     except Exception as e:
         gbp.log.err("Error creating %s: %s" % (output, e))
         return False
+    cache.store(cache_key, output)
     return True
 
 
@@ -157,7 +171,8 @@ def export_source(repo, tree, source, options, dest_dir, tarball_dir):
                      dest_dir)
 
     gbp.log.info("Exporting '%s' to '%s'" % (options.export, dest_dir))
-    if not dump_tree(repo, dest_dir, tree, options.with_submodules):
+    if not dump_tree(repo, dest_dir, tree, options.with_submodules,
+                     jobs=options.submodule_jobs):
         raise GbpError
 
 
@@ -165,8 +180,8 @@ def move_old_export(target):
     """move a build tree away if it exists"""
     try:
         os.mkdir(target)
-    except OSError as (e, msg):
-        if e == errno.EEXIST:
+    except OSError as err:
+        if err.errno == errno.EEXIST:
             os.rename(target, "%s.obsolete.%s" % (target, time.time()))
 
 
@@ -221,8 +236,8 @@ def prepare_output_dir(dir):
 
     try:
         os.mkdir(output_dir)
-    except OSError as (e, msg):
-        if e != errno.EEXIST:
+    except OSError as err:
+        if err.errno != errno.EEXIST:
             raise GbpError("Cannot create output dir %s" % output_dir)
     return output_dir
 
@@ -291,7 +306,10 @@ def git_archive_build_orig(repo, cp, output_dir, options):
     if not git_archive(repo, cp, output_dir, upstream_tree,
                        options.comp_type,
                        options.comp_level,
-                       options.with_submodules):
+                       options.with_submodules,
+                       options.submodule_jobs,
+                       options.parallel_compression,
+                       options.archive_cache):
         raise GbpError("Cannot create upstream tarball at '%s'" % output_dir)
     return upstream_tree
 
@@ -467,10 +485,16 @@ def build_parser(name, prefix=None):
                       help="Compression type, default is '%(compression)s'")
     orig_group.add_config_file_option(option_name="compression-level", dest="comp_level",
                       help="Compression level, default is '%(compression-level)s'")
+    orig_group.add_boolean_config_file_option(option_name="parallel-compression",
+                                              dest="parallel_compression")
+    orig_group.add_boolean_config_file_option(option_name="archive-cache",
+                                              dest="archive_cache")
     branch_group.add_config_file_option(option_name="upstream-branch", dest="upstream_branch")
     branch_group.add_config_file_option(option_name="debian-branch", dest="debian_branch")
     branch_group.add_boolean_config_file_option(option_name = "ignore-branch", dest="ignore_branch")
     branch_group.add_boolean_config_file_option(option_name = "submodules", dest="with_submodules")
+    branch_group.add_config_file_option(option_name="submodule-jobs", dest="submodule_jobs",
+                      type="int", metavar="N")
     cmd_group.add_config_file_option(option_name="builder", dest="builder",
                       help="command to build the Debian package, default is '%(builder)s'")
     cmd_group.add_config_file_option(option_name="cleaner", dest="cleaner",
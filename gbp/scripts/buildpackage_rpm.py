@@ -37,6 +37,7 @@ from gbp.rpm.git import GitRepositoryError, RpmGitRepository
 from gbp.rpm.policy import RpmPkgPolicy
 from gbp.tmpfile import init_tmpdir, del_tmpdir, tempfile
 from gbp.scripts.common.buildpackage import (index_name,
+                                             ArchiveCache, compressor,
                                              git_archive_submodules,
                                              git_archive_single, dump_tree,
                                              write_wc, drop_index)
@@ -58,7 +59,8 @@ def makedir(path):
 
 
 def git_archive(repo, spec, output_dir, treeish, prefix, comp_level,
-                with_submodules):
+                with_submodules, submodule_jobs=0, parallel_compression=False,
+                archive_cache=True):
     "Create a compressed orig tarball in output_dir using git_archive"
     comp_opts = ''
     if spec.orig_src['compression']:
@@ -68,21 +70,34 @@ def git_archive(repo, spec, output_dir, treeish, prefix, comp_level,
 
     # Remove extra slashes from prefix, will be added by git_archive_x funcs
     prefix = prefix.strip('/')
+
+    cache = ArchiveCache(repo)
+    cache_key = None
+    if archive_cache:
+        cache_key = cache.key(treeish, prefix, with_submodules, comp_level,
+                              comp_opts,
+                              compressor(spec.orig_src['compression'],
+                                         parallel_compression))
+    if cache.fetch(cache_key, output):
+        gbp.log.debug("Using cached archive of '%s' for %s" % (treeish, output))
+        return True
+
     try:
         if repo.has_submodules(treeish) and with_submodules:
             repo.update_submodules()
             git_archive_submodules(repo, treeish, output, prefix,
                                    spec.orig_src['compression'],
-                                   comp_level, comp_opts,
-                                   spec.orig_src['archive_fmt'])
+                                   comp_level, comp_opts, submodule_jobs,
+                                   parallel_compression)
 
         else:
             git_archive_single(treeish, output, prefix,
                                spec.orig_src['compression'], comp_level,
-                               comp_opts)
+                               comp_opts, parallel_compression)
     except (GitRepositoryError, CommandExecFailed):
         gbp.log.err("Error generating submodules' archives")
         return False
+    cache.store(cache_key, output)
     return True
 
 
@@ -230,7 +245,9 @@ def git_archive_build_orig(repo, spec, output_dir, options):
                                         options.comp_level))
         if not git_archive(repo, spec, output_dir, upstream_tree,
                            orig_prefix, options.comp_level,
-                           options.with_submodules):
+                           options.with_submodules, options.submodule_jobs,
+                           options.parallel_compression,
+                           options.archive_cache):
             raise GbpError("Cannot create upstream tarball at '%s'" %
                            output_dir)
     except (GitRepositoryError, GbpError) as err:
@@ -370,6 +387,10 @@ def build_parser(name, prefix=None, git_treeish=None):
                     dest="comp_level",
                     help="Compression level, default is "
                          "'%(compression-level)s'")
+    orig_group.add_boolean_config_file_option(option_name="parallel-compression",
+                    dest="parallel_compression")
+    orig_group.add_boolean_config_file_option(option_name="archive-cache",
+                    dest="archive_cache")
     branch_group.add_config_file_option(option_name="upstream-branch",
                     dest="upstream_branch")
     branch_group.add_config_file_option(option_name="packaging-branch",
@@ -378,6 +399,8 @@ def build_parser(name, prefix=None, git_treeish=None):
                     dest="ignore_branch")
     branch_group.add_boolean_config_file_option(option_name = "submodules",
                     dest="with_submodules")
+    branch_group.add_config_file_option(option_name="submodule-jobs",
+                    dest="submodule_jobs", type="int", metavar="N")
     cmd_group.add_config_file_option(option_name="builder", dest="builder",
                     help="command to build the package, default is "
                          "'%(builder)s'")
@@ -545,7 +568,10 @@ def main(argv):
                                        options.comp_level))
                     if not git_archive(repo, spec, source_dir, tree,
                                        orig_prefix, options.comp_level,
-                                       options.with_submodules):
+                                       options.with_submodules,
+                                       options.submodule_jobs,
+                                       options.parallel_compression,
+                                       options.archive_cache):
                         raise GbpError("Cannot create source tarball at '%s'" %
                                        source_dir)
             # Non-native packages: create orig tarball from upstream
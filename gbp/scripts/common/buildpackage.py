@@ -18,20 +18,85 @@
 #
 """Common functionality for Debian and RPM buildpackage scripts"""
 
+from contextlib import contextmanager
+import errno
+import hashlib
+import json
 import os, os.path
-import pipes
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import shlex
+import subprocess
+import tarfile
 import tempfile
+import threading
+import time
 import shutil
-from gbp.command_wrappers import (CatenateTarArchive)
+try:
+    from shutil import which
+except ImportError:
+    # Python 2
+    from distutils.spawn import find_executable as which
+from gbp.command_wrappers import (pipe_commands, set_pipe_size)
 from gbp.errors import GbpError
+from gbp.git import GitCommit, GitRepositoryError
+from gbp.pkg import parallel_compressors
 import gbp.log
 
 # when we want to reference the index in a treeish context we call it:
 index_name = "INDEX"
 # when we want to reference the working copy in treeish context we call it:
 wc_name = "WC"
-# index file name used to export working copy
-wc_index = ".git/gbp_index"
+# index file name used to export working copy, set up by write_wc
+wc_index = None
+# private directory holding wc_index if it's kept in memory
+_wc_index_dir = None
+# submodules of already inspected trees keyed by (repo path, sha1)
+_submodules_cache = {}
+
+
+def _trace2_event(event, label, **fields):
+    """
+    Append a git trace2 event to the target set via GIT_TRACE2_EVENT so
+    it shows up next to the events of the git commands we run
+    """
+    target = os.environ.get('GIT_TRACE2_EVENT', '')
+    if target.lower() in ['', '0', 'false']:
+        return
+    now = time.time()
+    fields.update({'event': event,
+                   'sid': 'gbp-%d' % os.getpid(),
+                   'thread': threading.current_thread().name,
+                   'time': '%s.%06dZ' % (time.strftime('%Y-%m-%dT%H:%M:%S',
+                                                      time.gmtime(now)),
+                                        (now % 1) * 1000000),
+                   'category': 'gbp',
+                   'label': label})
+    line = (json.dumps(fields) + '\n').encode('utf-8')
+    try:
+        if target.lower() in ['1', 'true']:
+            os.write(2, line)
+        elif target.isdigit():
+            os.write(int(target), line)
+        elif os.path.isabs(target):
+            if os.path.isdir(target):
+                target = os.path.join(target, 'gbp-%d' % os.getpid())
+            with open(target, 'ab') as trace:
+                trace.write(line)
+    except (IOError, OSError):
+        # tracing must not break the build
+        pass
+
+
+@contextmanager
+def _trace_region(label):
+    """Wrap a block into trace2 region_enter/region_leave events"""
+    start = time.time()
+    _trace2_event('region_enter', label)
+    try:
+        yield
+    finally:
+        _trace2_event('region_leave', label, t_rel=round(time.time() - start, 6))
 
 
 def sanitize_prefix(prefix):
@@ -50,94 +115,482 @@ def sanitize_prefix(prefix):
     return '/'
 
 
-def git_archive_submodules(repo, treeish, output, prefix, comp_type, comp_level, comp_opts):
+def submodule_prefix(prefix, subdir):
+    """
+    Prefix of a submodule's files in an archive using the (sanitized)
+    I{prefix}
+
+    >>> submodule_prefix('foo/', 'bar')
+    'foo/bar/'
+    >>> submodule_prefix('foo/', './bar/baz')
+    'foo/bar/baz/'
+    """
+    tarpath = [subdir, subdir[2:]][subdir.startswith("./")]
+    return '%s%s/' % (prefix, tarpath)
+
+
+def submodule_jobs(jobs=0):
+    """
+    Number of submodules to process in parallel
+
+    >>> submodule_jobs(3)
+    3
+    >>> 1 <= submodule_jobs(0) <= 8
+    True
+    """
+    if jobs > 0:
+        return jobs
+    try:
+        return min(8, multiprocessing.cpu_count())
+    except NotImplementedError:
+        return 1
+
+
+def compressor(comp_type, parallel=False):
+    """
+    The compressor to run for I{comp_type}
+
+    If I{parallel} is set a parallel implementation is used if installed.
+
+    >>> compressor('gzip')
+    'gzip'
+    >>> compressor('lzma', parallel=True)
+    'lzma'
+    """
+    if parallel:
+        parallel_comp = parallel_compressors.get(comp_type)
+        if parallel_comp and which(parallel_comp):
+            gbp.log.debug("Using %s instead of %s" % (parallel_comp, comp_type))
+            return parallel_comp
+    return comp_type
+
+
+def _shm_has_space(needed):
+    """
+    Check if /dev/shm has at least I{needed} bytes of free space
+    """
+    try:
+        st = os.statvfs('/dev/shm')
+    except OSError:
+        return False
+    return st.f_bavail * st.f_frsize >= needed
+
+
+def _object_dirs(repo):
+    """
+    The object directories an archive of I{repo} can draw from apart from
+    the repository's own: alternate object stores and the object
+    directories of the submodules' repositories below the git dir.
+    """
+    dirs = []
+    alternates = os.path.join(repo.git_dir, 'objects', 'info', 'alternates')
+    if os.path.exists(alternates):
+        with open(alternates) as f:
+            for line in f:
+                path = line.strip()
+                if path and not path.startswith('#'):
+                    dirs.append(os.path.join(repo.git_dir, 'objects', path))
+    for root, subdirs, files in os.walk(os.path.join(repo.git_dir, 'modules')):
+        if 'objects' in subdirs:
+            dirs.append(os.path.join(root, 'objects'))
+            # below a submodule's git dir only nested submodules matter
+            subdirs[:] = [d for d in subdirs if d == 'modules']
+    return dirs
+
+
+def _objects_size(repo):
+    """
+    Size of all the objects an archive of I{repo} can draw from in bytes
+    """
+    size = 0
+    for object_dir in [None] + _object_dirs(repo):
+        counts = repo.count_objects(object_dir)
+        size += 1024 * (counts.get('size', 0) + counts.get('size-pack', 0))
+    return size
+
+
+def _mkdtemp(repo):
+    """
+    Create a directory for intermediate tarballs. Keep it in memory if
+    /dev/shm has enough room for a rough estimate of the repository's
+    unpacked size, otherwise use the default temporary location.
+    """
+    try:
+        # objects are stored compressed, tarballs aren't
+        needed = 4 * _objects_size(repo)
+    except (GitRepositoryError, ValueError):
+        needed = None
+    if (needed is not None and os.access('/dev/shm', os.W_OK) and
+            _shm_has_space(needed)):
+        return tempfile.mkdtemp(dir='/dev/shm')
+    return tempfile.mkdtemp()
+
+
+def _in_tempdir(repo, func, *args):
+    """
+    Call I{func} with I{args} and a new directory for intermediate tarballs
+    as last argument and remove the directory afterwards.
+
+    If the directory is in /dev/shm but the estimate of the space needed
+    was too low retry once in the default temporary location. Since
+    git-archive doesn't tell why it failed any of its failures is taken
+    as running out of space.
+    """
+    tempdir = _mkdtemp(repo)
+    try:
+        return func(*(args + (tempdir,)))
+    except (GitRepositoryError, IOError, OSError) as err:
+        if os.path.dirname(tempdir) != '/dev/shm':
+            raise
+        if (not isinstance(err, GitRepositoryError) and
+                err.errno != errno.ENOSPC):
+            raise
+        gbp.log.debug("Not enough space in /dev/shm (%s), retrying in %s"
+                      % (err, tempfile.gettempdir()))
+    finally:
+        shutil.rmtree(tempdir)
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        return func(*(args + (tempdir,)))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+def _get_submodules(repo, treeish):
+    """
+    Like L{GitRepository.get_submodules} but cache the result
+
+    The cache is keyed by the resolved sha1 so moving branches don't
+    return stale results.
+    """
+    sha1 = treeish if GitCommit.is_sha1(treeish) else repo.rev_parse(treeish)
+    key = (repo.path, sha1)
+    if key not in _submodules_cache:
+        _submodules_cache[key] = repo.get_submodules(sha1)
+    return _submodules_cache[key]
+
+
+def _archive_submodules(repo, submodules, prefix, tempdir, jobs):
+    """
+    Create a tar archive of each of I{submodules} in I{tempdir}
+
+    Up to I{jobs} git-archive processes are run in parallel. Yields
+    (subdir, commit, tarfile) tuples in the order of I{submodules}.
+    """
+    def archive_submodule(task):
+        subdir, commit, subprefix, submodule_tarfile = task
+        gbp.log.debug("Archiving submodule %s (%s)" % (subdir, commit[0:8]))
+        with _trace_region('archive_submodule'):
+            repo.archive(format='tar', prefix=subprefix,
+                         output=submodule_tarfile, treeish=commit,
+                         cwd=os.path.join(repo.path, subdir))
+        return (subdir, commit, submodule_tarfile)
+
+    if not submodules:
+        return
+    # everything but running git-archive is done upfront so the workers
+    # don't share any state
+    tasks = [(subdir, commit, submodule_prefix(prefix, subdir),
+              os.path.join(tempdir, "sub-%d.tar" % idx))
+             for (idx, (subdir, commit)) in enumerate(submodules)]
+    pool = ThreadPool(min(submodule_jobs(jobs), len(tasks)))
+    try:
+        for result in pool.imap(archive_submodule, tasks):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _tar_data_end(path):
+    """
+    Offset of the end of the last member in the tar archive at I{path},
+    i.e. where the end of archive marker and record padding start
+    """
+    with tarfile.open(path) as tar:
+        tar.getmembers()
+        return tar.offset
+
+
+def _fadvise(fileobj, advice):
+    """
+    Pass I{advice} (the name of one of the POSIX_FADV_* constants) about
+    the whole of I{fileobj} on to the kernel if the platform supports it
+    """
+    fadvise = getattr(os, 'posix_fadvise', None)
+    if fadvise:
+        try:
+            fadvise(fileobj.fileno(), 0, 0, getattr(os, advice))
+        except OSError:
+            pass
+
+
+def _copy_file(src, dst):
+    """Copy the contents of file object I{src} to I{dst}'s position"""
+    sendfile = getattr(os, 'sendfile', None)
+    if sendfile:
+        offset, remaining = 0, os.fstat(src.fileno()).st_size
+        try:
+            while remaining:
+                sent = sendfile(dst.fileno(), src.fileno(), offset, remaining)
+                if not sent:
+                    break
+                offset += sent
+                remaining -= sent
+            return
+        except OSError as err:
+            # not all platforms can sendfile between regular files
+            if offset or err.errno not in (errno.EINVAL, errno.ENOSYS,
+                                           errno.ENOTSOCK):
+                raise
+    shutil.copyfileobj(src, dst)
+
+
+def _concat_tar(dst_path, src_path, dst_end=None):
+    """
+    Append the tar archive I{src_path} to the one at I{dst_path}
+
+    I{dst_path}'s end of archive marker and padding, starting at
+    I{dst_end}, get overwritten. The offset is read from the archive if
+    not given.
+
+    @return: the end of the last member in the concatenated archive so it
+        can be passed as I{dst_end} when appending another archive
+    @rtype: C{int}
+    """
+    if dst_end is None:
+        dst_end = _tar_data_end(dst_path)
+    with open(dst_path, 'r+b') as dst:
+        dst.truncate(dst_end)
+        dst.seek(dst_end)
+        with open(src_path, 'rb') as src:
+            _fadvise(src, 'POSIX_FADV_SEQUENTIAL')
+            _copy_file(src, dst)
+    return dst_end + _tar_data_end(src_path)
+
+
+def _link_or_copy(src, dst):
+    """Hard link I{src} to I{dst}, copy it if that's not possible"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+@contextmanager
+def _replace_output(output):
+    """
+    Provide a temporary file name to write I{output} to and move it into
+    place once done. I{output} must not be rewritten in place since it
+    can be hard linked into the L{ArchiveCache}.
+    """
+    tmp = output + '.tmp'
+    try:
+        yield tmp
+        os.rename(tmp, output)
+    finally:
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+
+
+class ArchiveCache(object):
+    """
+    Keeps the most recently generated upstream tarballs in the repository's
+    git dir so building again from an unchanged tree only needs to link the
+    tarball into place
+
+    This relies on the archive functions replacing their output rather
+    than rewriting it in place, see L{_replace_output}.
+    """
+    def __init__(self, repo, size=5):
+        self.repo = repo
+        self.path = os.path.join(repo.git_dir, 'gbp-archive-cache')
+        self.size = size
+
+    def key(self, treeish, *params):
+        """
+        The cache key of an archive of I{treeish} created with I{params}
+
+        The treeish is resolved to its sha1 (not its tree's since
+        git-archive records commit ids and times). The repository's
+        I{info/attributes} and I{tar.umask} setting are taken into account
+        too since they change what git-archive produces.
+
+        @return: the key or C{None} if I{treeish} can't be resolved
+        @rtype: C{str}
+        """
+        try:
+            sha1 = self.repo.rev_parse(treeish)
+        except GitRepositoryError:
+            return None
+        try:
+            umask = self.repo.get_config('tar.umask')
+        except KeyError:
+            umask = ''
+        try:
+            with open(os.path.join(self.repo.git_dir, 'info', 'attributes')) as f:
+                attributes = f.read()
+        except IOError:
+            attributes = ''
+        data = '\0'.join([sha1, umask, attributes] +
+                         [str(param) for param in params])
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def fetch(self, key, output):
+        """
+        Put the archive cached under I{key} at I{output}
+
+        @return: C{True} if the archive was found in the cache
+        @rtype: C{bool}
+        """
+        cached = os.path.join(self.path, key or '')
+        if not key or not os.path.exists(cached):
+            return False
+        try:
+            _link_or_copy(cached, output + '.new')
+            os.rename(output + '.new', output)
+            # mark as recently used
+            os.utime(cached, None)
+        except (IOError, OSError) as err:
+            gbp.log.debug("Failed to use cached archive for %s: %s" % (output, err))
+            return False
+        return True
+
+    def store(self, key, output):
+        """Add the archive I{output} to the cache as I{key}"""
+        if not key:
+            return
+        cached = os.path.join(self.path, key)
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            _link_or_copy(output, cached + '.new')
+            os.rename(cached + '.new', cached)
+            self._prune()
+        except (IOError, OSError) as err:
+            gbp.log.debug("Failed to cache archive %s: %s" % (output, err))
+
+    def _prune(self):
+        """Drop all but the I{size} most recently used archives"""
+        entries = [os.path.join(self.path, name) for name in os.listdir(self.path)]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for entry in entries[self.size:]:
+            os.unlink(entry)
+
+
+def git_archive_submodules(repo, treeish, output, prefix, comp_type, comp_level,
+                           comp_opts, jobs=0, parallel_compression=False):
     """
     Create tar.gz of an archive with submodules
 
     since git-archive always writes an end of tarfile trailer we concatenate
-    the generated archives using tar and compress the result.
+    the generated archives overwriting it and stream the result through the
+    compressor into I{output}. The submodules' archives are generated by up
+    to I{jobs} parallel git-archive processes but are appended to the main
+    archive in order.
 
     Exception handling is left to the caller.
     """
     prefix = sanitize_prefix(prefix)
-    tarfile = output.rsplit('.', 1)[0]
-    tempdir = tempfile.mkdtemp()
-    submodule_tarfile = os.path.join(tempdir, "submodule.tar")
-    try:
-        # generate main tarfile
-        repo.archive(format='tar', prefix=prefix,
-                     output=tarfile, treeish=treeish)
+    _in_tempdir(repo, _create_archive_with_submodules, repo, treeish, output,
+                prefix, comp_type, comp_level, comp_opts, jobs,
+                parallel_compression)
+
 
-        # generate each submodule's tarfile and append it to the main archive
-        for (subdir, commit) in repo.get_submodules(treeish):
-            tarpath = [subdir, subdir[2:]][subdir.startswith("./")]
+def _create_archive_with_submodules(repo, treeish, output, prefix, comp_type,
+                                    comp_level, comp_opts, jobs,
+                                    parallel_compression, tempdir):
+    """
+    Create the archive for L{git_archive_submodules} using I{tempdir} for
+    the intermediate tarballs
+    """
+    main_tarfile = os.path.join(tempdir, "main.tar")
+    # generate main tarfile
+    with _trace_region('archive'):
+        repo.archive(format='tar', prefix=prefix,
+                     output=main_tarfile, treeish=treeish)
 
-            gbp.log.debug("Processing submodule %s (%s)" % (subdir, commit[0:8]))
-            repo.archive(format='tar', prefix='%s%s/' % (prefix, tarpath),
-                         output=submodule_tarfile, treeish=commit, cwd=subdir)
-            CatenateTarArchive(tarfile)(submodule_tarfile)
+    # generate each submodule's tarfile and append it to the main archive
+    tar_end = None
+    for (subdir, commit, submodule_tarfile) in _archive_submodules(
+            repo, _get_submodules(repo, treeish), prefix, tempdir, jobs):
+        gbp.log.debug("Processing submodule %s (%s)" % (subdir, commit[0:8]))
+        with _trace_region('concat_tar'):
+            tar_end = _concat_tar(main_tarfile, submodule_tarfile, tar_end)
+        os.unlink(submodule_tarfile)
 
-        # compress the output
-        ret = os.system("%s -%s %s %s" % (comp_type, comp_level, comp_opts, tarfile))
+    # compress the output
+    cmd = ([compressor(comp_type, parallel_compression),
+            '-c', '-%s' % comp_level] + shlex.split(comp_opts))
+    with _replace_output(output) as tmp_output:
+        with _trace_region('compress'):
+            with open(main_tarfile, 'rb') as tar_fd:
+                _fadvise(tar_fd, 'POSIX_FADV_SEQUENTIAL')
+                with open(tmp_output, 'wb') as out_fd:
+                    ret = subprocess.call(cmd, stdin=tar_fd, stdout=out_fd)
         if ret:
             raise GbpError("Error creating %s: %d" % (output, ret))
-    finally:
-        shutil.rmtree(tempdir)
 
 
-def git_archive_single(treeish, output, prefix, comp_type, comp_level, comp_opts):
+def git_archive_single(treeish, output, prefix, comp_type, comp_level, comp_opts,
+                       parallel_compression=False):
     """
     Create tar.gz of an archive without submodules
 
     Exception handling is left to the caller.
     """
     prefix = sanitize_prefix(prefix)
-    pipe = pipes.Template()
-    pipe.prepend("git archive --format=tar --prefix=%s %s" % (prefix, treeish), '.-')
-    pipe.append('%s -c -%s %s' % (comp_type, comp_level, comp_opts),  '--')
-    ret = pipe.copy('', output)
-    if ret:
-        raise GbpError("Error creating %s: %d" % (output, ret))
+    archive = ['git', 'archive', '--format=tar', '--prefix=%s' % prefix, treeish]
+    compress = ([compressor(comp_type, parallel_compression),
+                 '-c', '-%s' % comp_level] + shlex.split(comp_opts))
+    with _replace_output(output) as tmp_output:
+        with _trace_region('archive'):
+            with open(tmp_output, 'wb') as out_fd:
+                ret = pipe_commands([archive, compress], stdout=out_fd)
+        if ret:
+            raise GbpError("Error creating %s: %d" % (output, ret))
 
 
 #{ Functions to handle export-dir
-def dump_tree(repo, export_dir, treeish, with_submodules, recursive=True):
+def dump_tree(repo, export_dir, treeish, with_submodules, recursive=True,
+              jobs=0):
     "dump a tree to output_dir"
     output_dir = os.path.dirname(export_dir)
     prefix = sanitize_prefix(os.path.basename(export_dir))
-    if recursive:
-        paths = []
-    else:
-        paths = ["'%s'" % nam for _mod, typ, _sha, nam in
-                    repo.list_tree(treeish) if typ == 'blob']
-
-    pipe = pipes.Template()
-    pipe.prepend('git archive --format=tar --prefix=%s %s -- %s' %
-                 (prefix, treeish, ' '.join(paths)), '.-')
-    pipe.append('tar -C %s -xf -' % output_dir,  '-.')
-    top = os.path.abspath(os.path.curdir)
+
     try:
-        ret = pipe.copy('', '')
-        if ret:
-            raise GbpError("Error in dump_tree archive pipe")
-
-        if recursive and with_submodules:
-            if repo.has_submodules():
-                repo.update_submodules()
-            for (subdir, commit) in repo.get_submodules(treeish):
-                gbp.log.info("Processing submodule %s (%s)" % (subdir, commit[0:8]))
-                tarpath = [subdir, subdir[2:]][subdir.startswith("./")]
-                os.chdir(subdir)
-                pipe = pipes.Template()
-                pipe.prepend('git archive --format=tar --prefix=%s%s/ %s' %
-                             (prefix, tarpath, commit), '.-')
-                pipe.append('tar -C %s -xf -' % output_dir,  '-.')
-                ret = pipe.copy('', '')
-                os.chdir(top)
-                if ret:
-                     raise GbpError("Error in dump_tree archive pipe in submodule %s" % subdir)
+        paths = []
+        if not recursive:
+            # Archive the toplevel files only. Rather than passing each of
+            # them as pathspec, which can exceed the maximum command line
+            # length, exclude the (usually few) subdirectories and
+            # submodules.
+            tree = repo.list_tree(treeish)
+            if [obj for obj in tree if obj[1] == 'blob']:
+                paths = [':(glob)*'] + [':(exclude,literal)%s' % obj[3]
+                                        for obj in tree if obj[1] != 'blob']
+            else:
+                # git-archive fails if the pathspec matches nothing
+                paths = None
+        if paths is not None:
+            with _trace_region('dump_tree'):
+                ret = pipe_commands([['git', 'archive', '--format=tar',
+                                      '--prefix=%s' % prefix, treeish, '--'] + paths,
+                                     ['tar', '-C', output_dir, '-xf', '-']])
+            if ret:
+                raise GbpError("Error in dump_tree archive pipe")
+
+        # Without a .gitmodules in the working copy the submodules can't be
+        # checked out so don't bother listing them
+        if recursive and with_submodules and repo.has_submodules():
+            repo.update_submodules()
+            submodules = _get_submodules(repo, treeish)
+            if submodules:
+                _in_tempdir(repo, _extract_submodules, repo, submodules,
+                            prefix, output_dir, jobs)
     except OSError as err:
-        gbp.log.err("Error dumping tree to %s: %s" % (output_dir, err[0]))
+        gbp.log.err("Error dumping tree to %s: %s" % (output_dir, err.args[0]))
         return False
     except GbpError as err:
         gbp.log.err(err)
@@ -145,13 +598,61 @@ def dump_tree(repo, export_dir, treeish, with_submodules, recursive=True):
     except Exception as e:
         gbp.log.err("Error dumping tree to %s: %s" % (output_dir, e))
         return False
-    finally:
-        os.chdir(top)
     return True
 
 
+def _extract_submodules(repo, submodules, prefix, output_dir, jobs, tempdir):
+    """
+    Extract I{submodules} for L{dump_tree} using I{tempdir} for their
+    intermediate tarballs
+
+    The submodules are archived in parallel and fed to a single tar
+    process, --ignore-zeros makes it read past each end of archive.
+    """
+    extract = subprocess.Popen(['tar', '-C', output_dir,
+                                '--ignore-zeros', '-xf', '-'],
+                               stdin=subprocess.PIPE)
+    set_pipe_size(extract.stdin)
+    try:
+        for (subdir, commit, submodule_tarfile) in _archive_submodules(
+                repo, submodules, prefix, tempdir, jobs):
+            gbp.log.info("Processing submodule %s (%s)" % (subdir, commit[0:8]))
+            with _trace_region('extract_submodule'):
+                with open(submodule_tarfile, 'rb') as tar_fd:
+                    _fadvise(tar_fd, 'POSIX_FADV_SEQUENTIAL')
+                    shutil.copyfileobj(tar_fd, extract.stdin)
+            os.unlink(submodule_tarfile)
+    finally:
+        extract.stdin.close()
+        ret = extract.wait()
+    if ret:
+        raise GbpError("Error in dump_tree archive pipe")
+
+
+def _setup_wc_index():
+    """
+    Pick the index file used to export the working copy. It's short lived
+    so keep it in memory if possible. Git can't start from an empty index
+    file and puts a lock file next to it so use a private directory
+    instead of a predictable name in the shared /dev/shm.
+    """
+    global wc_index, _wc_index_dir
+
+    if wc_index:
+        return
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        try:
+            _wc_index_dir = tempfile.mkdtemp(dir='/dev/shm', prefix='gbp_index_')
+            wc_index = os.path.join(_wc_index_dir, 'index')
+            return
+        except OSError:
+            pass
+    wc_index = ".git/gbp_index"
+
+
 def write_wc(repo, force=True):
     """write out the current working copy as a treeish object"""
+    _setup_wc_index()
     repo.add_files(repo.path, force=force, index_file=wc_index)
     tree = repo.write_tree(index_file=wc_index)
     return tree
@@ -159,5 +660,10 @@ def write_wc(repo, force=True):
 
 def drop_index():
     """drop our custom index"""
-    if os.path.exists(wc_index):
+    global wc_index, _wc_index_dir
+
+    if wc_index and os.path.exists(wc_index):
         os.unlink(wc_index)
+    if _wc_index_dir:
+        shutil.rmtree(_wc_index_dir, ignore_errors=True)
+    wc_index = _wc_index_dir = None
@@ -23,7 +23,6 @@ import os
 import shutil
 import tempfile
 import glob
-import pipes
 import time
 import gbp.command_wrappers as gbpc
 from gbp.deb.dscfile import DscFile
@@ -63,16 +62,14 @@ def download_source(pkg, dirs, unauth):
 
 def apply_patch(diff):
     "Apply patch to a source tree"
-    pipe = pipes.Template()
-    pipe.prepend('gunzip -c %s' % diff,  '.-')
-    pipe.append('patch -p1 --quiet', '-.')
     try:
-        ret = pipe.copy('', '')
+        ret = gbpc.pipe_commands([['gunzip', '-c', diff],
+                                  ['patch', '-p1', '--quiet']])
         if ret:
             gbp.log.err("Error import %s: %d" % (diff, ret))
             return False
     except OSError as err:
-        gbp.log.err("Error importing %s: %s" % (diff, err[0]))
+        gbp.log.err("Error importing %s: %s" % (diff, err.args[0]))
         return False
     return True
 
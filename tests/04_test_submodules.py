@@ -4,6 +4,7 @@
 
 from . import context
 
+import json
 import os
 import shutil
 import tarfile
@@ -116,6 +117,30 @@ def test_dump_tree():
     ok_(not os.path.exists(os.path.join(dumpdir, SUBMODULES[0].name)))
 
 
+def test_dump_tree_trace2():
+    """Dumping a tree emits matching trace2 regions"""
+    dumpdir = TMPDIR.join("dump_trace2")
+    os.mkdir(dumpdir)
+    trace = str(TMPDIR.join("trace2.json"))
+    os.environ['GIT_TRACE2_EVENT'] = trace
+    try:
+        ok_(buildpackage.dump_tree(REPO, dumpdir, "master", True))
+    finally:
+        del os.environ['GIT_TRACE2_EVENT']
+    with open(trace) as f:
+        events = [ json.loads(line) for line in f ]
+    regions = [ (e['event'], e['label']) for e in events
+                if e.get('category') == 'gbp' ]
+    ok_(('region_enter', 'dump_tree') in regions)
+    ok_(('region_enter', 'extract_submodule') in regions)
+    for label in set(label for (event, label) in regions):
+        eq_(regions.count(('region_enter', label)),
+            regions.count(('region_leave', label)))
+    for e in events:
+        if e.get('category') == 'gbp':
+            ok_(e['time'].endswith('Z'))
+
+
 def test_create_tarballs():
     """Create an upstream tarball"""
     # Tarball with submodules
@@ -127,6 +152,73 @@ def test_create_tarballs():
     ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD", "bzip2",
                                  "9", False))
 
+def test_cached_tarball():
+    """Recreating a tarball from the same tree uses the archive cache"""
+    cachedir = os.path.join(REPO.git_dir, 'gbp-archive-cache')
+    cached = [ os.stat(os.path.join(cachedir, f)).st_ino
+               for f in os.listdir(cachedir) ]
+    eq_(len(cached), 2)
+    tarball = TMPDIR.join("test_0.1.orig.tar.bz2")
+    os.unlink(tarball)
+    changelog = { "Source": "test", "Upstream-Version": "0.1" }
+    ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD", "bzip2",
+                                 "9", True))
+    # served from the cache which is left untouched
+    eq_(sorted(cached), sorted([ os.stat(os.path.join(cachedir, f)).st_ino
+                                 for f in os.listdir(cachedir) ]))
+    ok_(os.stat(tarball).st_ino in cached)
+
+
+def test_cached_tarball_overwritten():
+    """Overwriting a tarball doesn't modify cached archives"""
+    changelog = { "Source": "test", "Upstream-Version": "0.5" }
+    tarball = TMPDIR.join("test_0.5.orig.tar.bz2")
+    ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD~1",
+                                 "bzip2", "9", False))
+    with open(tarball, 'rb') as f:
+        first = f.read()
+    ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD",
+                                 "bzip2", "9", False))
+    with open(tarball, 'rb') as f:
+        ok_(f.read() != first)
+    os.unlink(tarball)
+    ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD~1",
+                                 "bzip2", "9", False))
+    with open(tarball, 'rb') as f:
+        eq_(f.read(), first)
+
+
+def test_cached_tarball_attributes():
+    """Changing info/attributes doesn't use a stale cached tarball"""
+    changelog = { "Source": "test", "Upstream-Version": "0.7" }
+    tarball = TMPDIR.join("test_0.7.orig.tar.bz2")
+    ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD",
+                                 "bzip2", "9", False))
+    ok_("test-0.7/%s" % TESTFILE_NAME in tarfile.open(tarball).getnames())
+    attributes = os.path.join(REPO.git_dir, 'info', 'attributes')
+    if not os.path.isdir(os.path.dirname(attributes)):
+        os.makedirs(os.path.dirname(attributes))
+    with open(attributes, 'w') as f:
+        f.write("/%s export-ignore\n" % TESTFILE_NAME)
+    try:
+        ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD",
+                                     "bzip2", "9", False))
+    finally:
+        os.unlink(attributes)
+    ok_("test-0.7/%s" % TESTFILE_NAME not in tarfile.open(tarball).getnames())
+
+
+def test_no_archive_cache():
+    """Tarballs aren't cached if the cache is disabled"""
+    cachedir = os.path.join(REPO.git_dir, 'gbp-archive-cache')
+    cached = sorted(os.listdir(cachedir))
+    changelog = { "Source": "test", "Upstream-Version": "0.6" }
+    ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD",
+                                 "bzip2", "9", False, archive_cache=False))
+    ok_(os.path.exists(TMPDIR.join("test_0.6.orig.tar.bz2")))
+    eq_(sorted(os.listdir(cachedir)), cached)
+
+
 def test_check_tarfiles():
     """Check the contents of the created tarfile"""
     # Check tarball with submodules
@@ -154,4 +246,45 @@ def test_get_more_submodules():
         ok_(os.path.basename(module[0]) in SUBMODULE_NAMES)
 
 
+def test_dump_tree_more_submodules():
+    """Dump the repository with several submodules"""
+    dumpdir = TMPDIR.join("dump3")
+    os.mkdir(dumpdir)
+    ok_(buildpackage.dump_tree(REPO, dumpdir, "master", True))
+    for name in SUBMODULE_NAMES:
+        ok_(os.path.exists(os.path.join(dumpdir, name, TESTFILE_NAME)))
+        ok_(os.path.exists(os.path.join(dumpdir, name, TESTDIR_NAME,
+                                        TESTFILE_NAME)))
+
+
+def test_create_tarball_parallel():
+    """Create an upstream tarball archiving submodules in parallel"""
+    changelog = { "Source": "test", "Upstream-Version": "0.3" }
+    ok_(buildpackage.git_archive(REPO, changelog, str(TMPDIR), "HEAD", "bzip2",
+                                 "9", True, 2))
+    tarobj = tarfile.open(TMPDIR.join("test_0.3.orig.tar.bz2"), 'r:*')
+    files = [ f.name for f in tarobj.getmembers() ]
+    for name in SUBMODULE_NAMES:
+        ok_(("test-0.3/%s/%s" % (name, TESTFILE_NAME)) in files)
+    eq_(len(files) , 15)
+
+
+def test_dump_tree_nonrecursive():
+    """A non-recursive dump has the toplevel files with the commit's time"""
+    with open("toplevel", "w") as f:
+        f.write("toplevel\n")
+    REPO.add_files("toplevel")
+    os.environ['GIT_COMMITTER_DATE'] = '2001-01-01T00:00:00Z'
+    try:
+        REPO.commit_all(msg="Added toplevel file")
+    finally:
+        del os.environ['GIT_COMMITTER_DATE']
+    dumpdir = TMPDIR.join("dump_nonrecursive")
+    os.mkdir(dumpdir)
+    ok_(buildpackage.dump_tree(REPO, dumpdir, "master", True, False))
+    eq_(sorted(os.listdir(dumpdir)),
+        sorted([".gitmodules", TESTFILE_NAME, "toplevel"]))
+    for name in os.listdir(dumpdir):
+        eq_(os.stat(os.path.join(dumpdir, name)).st_mtime, 978307200)
+
 # vim:et:ts=4:sw=4:et:sts=4:ai:set list listchars=tab\:»·,trail\:·:
@@ -1,11 +1,12 @@
 # vim: set fileencoding=utf-8 :
 """Test L{gbp.command_wrappers.Command}'s tarball unpack"""
 
+import os
 import unittest
 import mock
 import functools
 
-from gbp.command_wrappers import Command, CommandExecFailed
+from gbp.command_wrappers import Command, CommandExecFailed, RunAtCommand
 from . testutils import GbpLogTester
 
 
@@ -68,3 +69,13 @@ class TestCommandWrapperFailures(unittest.TestCase, GbpLogTester):
         self.false.__call__()
         self.log_tester._check_log_empty()
         self.assertEqual(self.false.retcode, 0)
+
+
+class TestRunAtCommand(unittest.TestCase):
+    @patch_popen(returncode=0)
+    def test_run_in_dir(self, create_mock):
+        """The command runs in the given directory without changing ours"""
+        curdir = os.path.abspath(os.path.curdir)
+        RunAtCommand('/does/not/matter')(dir='/tmp')
+        self.assertEqual(create_mock.call_args[1]['cwd'], '/tmp')
+        self.assertEqual(os.path.abspath(os.path.curdir), curdir)
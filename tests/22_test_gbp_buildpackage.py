@@ -1,7 +1,14 @@
 # vim: set fileencoding=utf-8 :
 """Test L{gbp.command_wrappers.Command}'s tarball unpack"""
 
+import os
+import stat
+import tempfile
+import unittest
+
 from gbp.scripts.buildpackage import get_pbuilder_dist, GbpError
+from gbp.git import GitRepositoryError
+from gbp.scripts.common import buildpackage as common
 from . testutils import DebianGitTestRepo
 
 from mock import patch
@@ -74,3 +81,62 @@ class TestGbpBuildpackage(DebianGitTestRepo):
         with self.assertRaisesRegexp(GbpError,
                                      'DEP14 DIST setup needs branch name to be vendor/suite'):
             get_pbuilder_dist(self.options, self.repo)
+
+
+class TestWriteWc(DebianGitTestRepo):
+    def setUp(self):
+        DebianGitTestRepo.setUp(self)
+        self.add_file('doesnotmatter')
+
+    def tearDown(self):
+        common.drop_index()
+        DebianGitTestRepo.tearDown(self)
+
+    def test_write_wc(self):
+        """The working copy is exported via a private index"""
+        self.assertEqual(common.wc_index, None)
+        tree = common.write_wc(self.repo)
+        self.assertEqual(tree, self.repo.rev_parse('HEAD^{tree}'))
+        index = common.wc_index
+        self.assertTrue(os.path.exists(index))
+        if index.startswith('/dev/shm/'):
+            mode = os.stat(os.path.dirname(index)).st_mode
+            self.assertEqual(stat.S_IMODE(mode), 0o700)
+        common.drop_index()
+        self.assertFalse(os.path.exists(index))
+        self.assertEqual(common.wc_index, None)
+
+
+@unittest.skipUnless(os.access('/dev/shm', os.W_OK), "needs a writable /dev/shm")
+class TestInTempdir(unittest.TestCase):
+    def setUp(self):
+        self.tempdirs = []
+
+    def _fill_shm(self, tempdir):
+        self.tempdirs.append(tempdir)
+        self.assertTrue(os.path.isdir(tempdir))
+        if tempdir.startswith('/dev/shm/'):
+            raise GitRepositoryError("Unable to archive")
+        return 'done'
+
+    @patch('gbp.scripts.common.buildpackage._mkdtemp',
+           side_effect=lambda repo: tempfile.mkdtemp(dir='/dev/shm'))
+    def test_retry_on_disk(self, patch):
+        """Running out of space in /dev/shm retries in the default location"""
+        self.assertEqual(common._in_tempdir(None, self._fill_shm), 'done')
+        self.assertEqual(len(self.tempdirs), 2)
+        self.assertTrue(self.tempdirs[0].startswith('/dev/shm/'))
+        self.assertFalse(self.tempdirs[1].startswith('/dev/shm/'))
+        for tempdir in self.tempdirs:
+            self.assertFalse(os.path.exists(tempdir))
+
+    @patch('gbp.scripts.common.buildpackage._mkdtemp',
+           side_effect=lambda repo: tempfile.mkdtemp(dir='/dev/shm'))
+    def test_no_retry_on_other_errors(self, patch):
+        """Errors other than running out of space aren't retried"""
+        def fail(tempdir):
+            self.tempdirs.append(tempdir)
+            raise OSError(2, "No such file or directory")
+        self.assertRaises(OSError, common._in_tempdir, None, fail)
+        self.assertEqual(len(self.tempdirs), 1)
+        self.assertFalse(os.path.exists(self.tempdirs[0]))
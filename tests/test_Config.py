@@ -83,3 +83,23 @@ def test_filter():
     >>> del os.environ['GBP_CONF_FILES']
     """
 
+
+def test_submodule_jobs():
+    """
+    The submodule-jobs option can be set via a config file
+    >>> import os
+    >>> from gbp.config import GbpOptionParser
+    >>> tmpdir = str(context.new_tmpdir('baz'))
+    >>> confname = os.path.join(tmpdir, 'gbp.conf')
+    >>> f = open(confname, 'w')
+    >>> ret = f.write('[baz]\\nsubmodule-jobs = 4\\n')
+    >>> f.close()
+    >>> os.environ['GBP_CONF_FILES'] = confname
+    >>> parser = GbpOptionParser('baz')
+    >>> parser.add_config_file_option(option_name='submodule-jobs',
+    ...                               dest='submodule_jobs', type='int')
+    >>> options, args = parser.parse_args([])
+    >>> options.submodule_jobs
+    4
+    >>> del os.environ['GBP_CONF_FILES']
+    """
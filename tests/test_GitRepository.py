@@ -786,6 +786,29 @@ def test_gc():
     >>> repo.collect_garbage()
     """
 
+def test_count_objects():
+    """
+    Test counting objects
+
+    Methods tested:
+         - L{gbp.git.GitRepository.count_objects}
+
+    >>> import gbp.git
+    >>> repo = gbp.git.GitRepository(repo_dir)
+    >>> counts = repo.count_objects()
+    >>> counts['count'] + counts['in-pack'] > 0
+    True
+    >>> ref_dir = str(context.new_tmpdir('ref_clone'))
+    >>> ref_clone = gbp.git.GitRepository.clone(ref_dir, repo_dir, reference=repo_dir)
+    >>> counts = ref_clone.count_objects()
+    >>> 'alternate' in counts
+    False
+    >>> import os
+    >>> counts = ref_clone.count_objects(os.path.join(repo_dir, '.git', 'objects'))
+    >>> counts['count'] + counts['in-pack'] > 0
+    True
+    """
+
 def test_grep_log():
     """
     Test grepping through commit messages